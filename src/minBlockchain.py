@@ -1,8 +1,11 @@
 import hashlib
+import logging
 import time
 import random
 from minMutex import Mutex
 
+log = logging.getLogger("minRTOS.blockchain")  # Handlers and level are left to the application
+
 class Block:
     def __init__(self, index, prev_hash, transactions):
         self.index = index
@@ -17,12 +20,23 @@ class Block:
         return hashlib.sha256(block_string.encode()).hexdigest()
 
     def mine(self, difficulty):
-        prefix = '0' * difficulty
+        # Only the nonce changes while mining, so hash the fixed prefix once and copy its midstate
+        midstate = hashlib.sha256(f"{self.index}{self.prev_hash}{self.transactions}".encode())
+        zero_bytes, odd_nibble = divmod(difficulty, 2)
+        zero_prefix = b'\0' * zero_bytes
+        suffix = str(self.timestamp).encode()
+        nonce = self.nonce
         while True:
-            self.hash = self.compute_hash()
-            if self.hash.startswith(prefix):
+            h = midstate.copy()
+            h.update(str(nonce).encode())
+            h.update(suffix)
+            digest = h.digest()
+            # Compare raw bytes instead of hexdigest().startswith('0' * difficulty)
+            if digest.startswith(zero_prefix) and (not odd_nibble or digest[zero_bytes] < 0x10):
                 break
-            self.nonce += 1
+            nonce += 1
+        self.nonce = nonce
+        self.hash = digest.hex()
 
 class BlockchainStateManager:
     def __init__(self):
@@ -33,23 +47,23 @@ class BlockchainStateManager:
 
     def add_block(self, block):
         self.blocks.append(block)
-        print(f"[Blockchain] Block {block.index} added. Hash: {block.hash}")
+        log.info("[Blockchain] Block %s added. Hash: %s", block.index, block.hash)
 
     def add_transaction(self, tx):
         self.tx_pool.append(tx)
-        print(f"[Blockchain] Transaction added: {tx}")
+        log.info("[Blockchain] Transaction added: %s", tx)
 
     def apply_transaction(self, tx):
         self.state[tx['to']] = self.state.get(tx['to'], 0) + tx['amount']
-        print(f"[Blockchain] State updated: {tx['to']} -> {self.state[tx['to']]}")
+        log.info("[Blockchain] State updated: %s -> %s", tx['to'], self.state[tx['to']])
 
 # Consensus simulation (PoW)
 def consensus_task(state_manager, difficulty):
     if not state_manager.tx_pool:
-        print("[Consensus] No transactions to mine.")
+        log.info("[Consensus] No transactions to mine.")
         return
     block = Block(len(state_manager.blocks), state_manager.blocks[-1].hash if state_manager.blocks else '0'*64, list(state_manager.tx_pool))
-    print(f"[Consensus] Mining block {block.index} with {len(block.transactions)} txs...")
+    log.info("[Consensus] Mining block %s with %s txs...", block.index, len(block.transactions))
     block.mine(difficulty)
     state_manager.add_block(block)
     state_manager.tx_pool.clear()
@@ -57,31 +71,33 @@ def consensus_task(state_manager, difficulty):
 # Transaction validation
 def tx_validation_task(state_manager):
     if not state_manager.tx_pool:
-        print("[Validation] No transactions to validate.")
+        log.info("[Validation] No transactions to validate.")
         return
-    for tx in list(state_manager.tx_pool):
+    valid = []
+    for tx in state_manager.tx_pool:
         if tx['amount'] <= 0:
-            print(f"[Validation] Invalid transaction: {tx}")
-            state_manager.tx_pool.remove(tx)
+            log.info("[Validation] Invalid transaction: %s", tx)
         else:
-            print(f"[Validation] Transaction valid: {tx}")
+            log.info("[Validation] Transaction valid: %s", tx)
+            valid.append(tx)
+    state_manager.tx_pool[:] = valid  # One O(N) rebuild instead of a list.remove per invalid tx
 
 # Contract execution sandbox
 def contract_sandbox_task(contract_name, state_manager):
-    print(f"[Sandbox] Executing contract: {contract_name}")
+    log.info("[Sandbox] Executing contract: %s", contract_name)
     tx = {'to': contract_name, 'amount': random.randint(1, 10)}
     state_manager.apply_transaction(tx)
     time.sleep(0.05)
 
 # Network simulation
 def network_task(state_manager):
-    print("[Network] Simulating peer message...")
+    log.info("[Network] Simulating peer message...")
     tx = {'to': f'user{random.randint(1,5)}', 'amount': random.randint(1, 20)}
     state_manager.add_transaction(tx)
     time.sleep(0.03)
 
 # API simulation
 def api_task(state_manager):
-    print("[API] Querying blockchain state...")
-    print(f"[API] Current state: {state_manager.state}")
+    log.info("[API] Querying blockchain state...")
+    log.info("[API] Current state: %s", state_manager.state)
     time.sleep(0.02)
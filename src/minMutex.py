@@ -1,58 +1,130 @@
-import multiprocessing
+import threading
 import time
+import heapq
+import itertools
+from collections import deque
+from minTrace import trace
+
+loop_threads = set()  # Idents of running Scheduler loops; only inline tasks lock from these threads
+
+class DeadlockError(RuntimeError):
+    """Raised when acquiring a Mutex would close a cycle in the wait-for graph."""
+
 
 class Mutex:
-    """Mutex with priority inheritance and timeout handling."""
-    def __init__(self, enable_priority_inheritance=True):
-        self.lock = multiprocessing.RLock()  # Reentrant lock to prevent deadlocks
+    """Mutex using the immediate priority ceiling protocol, with timeout handling."""
+    def __init__(self, enable_priority_inheritance=True, priority_ceiling=None, fifo=False):
+        self.lock = threading.RLock()  # Reentrant lock to prevent deadlocks
+        self._cv = threading.Condition(self.lock)  # Signalled when ownership changes
         self.owner = None  # The current task holding the mutex
-        self.waiting_tasks = []  # List of tasks waiting for the mutex
-        self.original_priorities = {}  # Store original priorities for restoration
+        self._owner_thread = None  # Ident of the thread that locked it; None after a handoff until the waiter wakes
+        self.fifo = fifo  # Hand the mutex over in arrival order instead of by priority
+        self._waiters = deque() if fifo else []  # Tasks in arrival order, or a (-priority, seq, task) heap
+        self._waiter_set = set()  # Names of queued tasks for O(1) membership tests
+        self._seq = itertools.count()  # FIFO tie-breaker among equal priorities
         self.enable_priority_inheritance = enable_priority_inheritance
+        self.priority_ceiling = priority_ceiling  # Highest priority of any task that locks this mutex
 
     def acquire(self, task, timeout=None):
         """Attempt to acquire the mutex, optionally with a timeout."""
-        start_time = time.time()
-        while True:
-            with self.lock:
-                if self.owner is None:
-                    self.owner = task
-                    print(f"✅ {task.name} acquired Mutex")
-                    return True
-                else:
-                    if task not in self.waiting_tasks:
-                        self.waiting_tasks.append(task)
-                        self._boost_priority()
-                    
-            if timeout and (time.time() - start_time) >= timeout:
-                print(f"⏳ {task.name} timed out waiting for Mutex")
-                return False
-            
-            time.sleep(0.01)  # Small delay to prevent busy-waiting
+        deadline = time.monotonic() + timeout if timeout else None
+        ident = threading.get_ident()
+        with self._cv:
+            stack = task._saved_prio_stack
+            self._raise_ceiling(stack[0][1] if stack else task.priority)  # Unboosted priority
+            # Ownership may be handed to us directly by release()
+            while self.owner is not None and self.owner is not task:
+                if task.name not in self._waiter_set:
+                    if self._owner_thread == ident and ident in loop_threads:
+                        # The owner is an inline task: blocking the scheduler loop means it never runs again
+                        if deadline is not None:
+                            trace("mutex_timeout", task.name)
+                            return False
+                        trace("mutex_deadlock", task.name, self.owner.name)
+                        raise DeadlockError(f"{task.name} would block the scheduler loop {self.owner.name} needs to release the Mutex")
+                    self._check_deadlock(task)
+                    task._waiting_on = self
+                    if self.fifo:
+                        self._waiters.append(task)
+                    else:
+                        heapq.heappush(self._waiters, (-task.priority, next(self._seq), task))
+                    self._waiter_set.add(task.name)
+
+                remaining = deadline - time.monotonic() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    self._waiter_set.discard(task.name)  # Stale heap entry is skipped on release
+                    task._waiting_on = None
+                    trace("mutex_timeout", task.name)
+                    return False
+                self._cv.wait(timeout=remaining)
+
+            task._waiting_on = None
+            if self.owner is None:
+                self._set_owner(task)
+                trace("mutex_acquire", task.name)
+            self._owner_thread = ident
+            return True
 
     def release(self):
         """Release the mutex and restore priority if necessary."""
-        with self.lock:
+        with self._cv:
             if self.owner:
-                # Restore the owner's priority only if it holds no other mutexes
-                if self.owner.name in self.original_priorities:
-                    print(f"🔓 {self.owner.name} released Mutex (Restoring priority)")
-                    self.owner.priority = self.original_priorities.pop(self.owner.name)
+                self.restore_priority(self.owner)
                 self.owner = None
+                self._owner_thread = None
+
+            # Assign mutex to the next waiting task: first in line, or highest priority
+            while self._waiters:
+                task = self._waiters.popleft() if self.fifo else heapq.heappop(self._waiters)[2]
+                if task.name in self._waiter_set:
+                    self._waiter_set.discard(task.name)
+                    self._set_owner(task)
+                    trace("mutex_handoff", task.name)
+                    break
+            self._cv.notify_all()
+
+    def _check_deadlock(self, task):
+        """Follow owner -> mutex it waits on -> owner ...; reaching task means a cycle."""
+        owner, seen = self.owner, set()
+        while owner is not None and owner not in seen:
+            if owner is task:
+                trace("mutex_deadlock", task.name, self.owner.name)
+                raise DeadlockError(f"{task.name} would deadlock waiting on Mutex held by {self.owner.name}")
+            seen.add(owner)
+            mutex = owner._waiting_on
+            owner = mutex.owner if mutex is not None else None
+
+    def _raise_ceiling(self, priority):
+        """Learn the ceiling from every task that tries to lock; hoist a lower owner at once."""
+        if self.priority_ceiling is None or priority > self.priority_ceiling:
+            self.priority_ceiling = priority
+            owner = self.owner
+            if owner and self.enable_priority_inheritance and owner.priority < priority:
+                trace("mutex_boost", owner.name, owner.priority, priority)
+                owner.priority = priority
+
+    def _set_owner(self, task):
+        """Make task the owner and raise it straight to the ceiling, saving its priority."""
+        self.owner = task
+        task._saved_prio_stack.append((self, task.priority))
+        if self.enable_priority_inheritance and self.priority_ceiling > task.priority:
+            task.priority = self.priority_ceiling
 
-            # Assign mutex to the next highest-priority waiting task
-            if self.waiting_tasks:
-                self.waiting_tasks.sort(key=lambda t: t.priority, reverse=True)
-                self.owner = self.waiting_tasks.pop(0)
-                print(f"✅ {self.owner.name} acquired Mutex from queue")
-                self._boost_priority()
-
-    def _boost_priority(self):
-        """Boost the owner's priority if higher-priority tasks are waiting."""
-        if self.owner and self.waiting_tasks and self.enable_priority_inheritance:
-            highest_priority = max(task.priority for task in self.waiting_tasks)
-            if highest_priority > self.owner.priority:
-                if self.owner.name not in self.original_priorities:
-                    self.original_priorities[self.owner.name] = self.owner.priority
-                print(f"⚡ Boosting priority of {self.owner.name} from {self.owner.priority} to {highest_priority}")
-                self.owner.priority = highest_priority
+    def restore_priority(self, task):
+        """Pop the priority task had before locking this mutex; handles out-of-order release."""
+        stack = task._saved_prio_stack
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i][0] is self:
+                break
+        else:
+            return
+        priority = stack.pop(i)[1]
+        # Mutexes locked after this one saved a priority that included our ceiling
+        for j in range(i, len(stack)):
+            mutex = stack[j][0]
+            stack[j] = (mutex, priority)
+            if mutex.enable_priority_inheritance and mutex.priority_ceiling > priority:
+                priority = mutex.priority_ceiling
+        if priority != task.priority:
+            trace("mutex_restore", task.name, task.priority, priority)
+        task.priority = priority
@@ -1,5 +1,5 @@
 from minScheduler import Scheduler
 from minTasks import Task
-from minMutex import Mutex
+from minMutex import Mutex, DeadlockError
 
-__all__ = ["Scheduler", "Task", "Mutex"]
+__all__ = ["Scheduler", "Task", "Mutex", "DeadlockError"]
@@ -1,120 +1,378 @@
+import asyncio
+import os
 import threading
 import time
-import multiprocessing
+import heapq
+import itertools
+import operator
 import queue
 import signal
-from minTasks import Task
-from minMutex import Mutex
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from minMutex import Mutex, loop_threads
+import minTrace
 
 LOG_FILE = "minRTOS_log.txt"
+PRIORITY_LEVELS = 256  # Fixed-priority ready buckets; priorities are clamped to 0..255
 
 class Scheduler:
-    """Real-time task scheduler with multiprocessing and dynamic task management."""
+    """Real-time task scheduler running tasks cooperatively from a single loop."""
     
-    def __init__(self, scheduling_policy="EDF"):
+    def __init__(self, scheduling_policy="EDF", max_tasks=64, rt_priority=None, cpu=None,
+                 busy_wait_threshold=200e-6):
         self.tasks = {}  # Mapping of task names to Task objects
-        self.message_queues = {}  # Message queues for inter-task communication
-        self.lock = threading.Lock()
+        self.message_queues = {}  # Task name -> its slot's message queue
+        # Fixed task table sized at construction: add_task never allocates a mailbox
+        self.max_tasks = max_tasks
+        self._task_slots = [None] * max_tasks
+        self._msg_queues = [deque() for _ in range(max_tasks)]  # append/popleft are atomic: no lock or pickling
+        self._free_slots = list(range(max_tasks - 1, -1, -1))  # Stack; slot 0 is handed out first
+        self._ready = []  # (priority key, seq, task name) min-heap of released tasks (EDF/RMS)
+        self._buckets = [deque() for _ in range(PRIORITY_LEVELS)]  # Released task names per fixed priority
+        self._bitmap = 0  # Bit p set while bucket p is non-empty
+        self._heap_seq = itertools.count()  # Tie-breaker so equal keys never compare names
+        self._releases = []  # (release time, seq, task) min-heap of pending periodic releases
+        self._in_flight = set()  # Names of parallel or coro tasks currently off the loop
+        self._crashed = []  # Tasks whose run raised outside update(); restarted by monitor_tasks
+        self._missed_total = 0  # Sum of missed_deadlines over registered tasks, kept incrementally
+        self._all_periodic = True  # Every registered task has period > 0; None means recompute
+        self._executor = None  # Created on the first parallel task
+        self._loop = None  # asyncio loop for coro tasks, run by run_asyncio on first use
+        self.lock = threading.RLock()  # Reentrant: releases re-enter from task callbacks
         self.schedule_cond = threading.Condition(self.lock)
         self.scheduling_policy = scheduling_policy
+        self._prio_key = self._make_key(scheduling_policy)  # Respecialized on every policy switch
+        self.rt_priority = rt_priority  # SCHED_FIFO priority for the scheduler thread (Linux)
+        self.cpu = cpu  # Core to pin the scheduler thread to (Linux)
+        self.busy_wait_threshold = busy_wait_threshold  # Spin instead of sleeping below this (s); 0 disables
         self.scheduler_running = threading.Event()
+        self._all_done = threading.Event()  # Set while no registered task is still running; see join_tasks
+        self._all_done.set()
         self.scheduler_thread = None  
-        self.log_queue = queue.Queue()
+        self.ring = minTrace.ring  # Process-wide, shared with every Scheduler and Mutex; see dump_trace()
+        self.log_queue = queue.SimpleQueue()  # Drained by _log_writer; C-level put, no Python lock
+        self._log_thread = threading.Thread(target=self._log_writer, daemon=True)
+        self._log_thread.start()
         import sys
-        if sys.platform != "win32":
-            import signal
+        # signal.signal only works on the main thread
+        if sys.platform != "win32" and threading.current_thread() is threading.main_thread():
             signal.signal(signal.SIGUSR1, self._signal_handler)
 
     def add_task(self, task):
-        """Dynamically add a task."""
+        """Dynamically add a task; returns its slot handle, or None if the task table is full."""
         with self.schedule_cond:
+            old = self.tasks.get(task.name)
+            if old is not None:
+                slot = old._slot  # Replacing a task keeps its slot and mailbox
+            elif self._free_slots:
+                slot = self._free_slots.pop()
+            else:
+                self.log(f"❌ Task {task.name} rejected: all {self.max_tasks} task slots in use.")
+                return None
+            if old is not None:
+                self._missed_total -= old._missed_seen
+                self._all_periodic = None
+            elif self._all_periodic:
+                self._all_periodic = task.period > 0
+            task._slot = slot
+            task._missed_seen = task.metrics["missed_deadlines"]
+            self._missed_total += task._missed_seen
+            self._task_slots[slot] = task
             self.tasks[task.name] = task
-            self.message_queues[task.name] = multiprocessing.Queue()
-            task.process.start()
+            self.message_queues[task.name] = self._msg_queues[slot]
+            task._sort_key = self._prio_key(task)  # Re-keyed on release under fixed and EDF
+            task.on_release = self._release
+            if old is not task:  # Re-adding the same Task must not start a second release chain
+                self._schedule_release(task)
+            if task.running:
+                self._all_done.clear()
+            if task.parallel and self._executor is None:
+                self._executor = ThreadPoolExecutor(thread_name_prefix="minRTOS")
+            if task.coro and self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                if hasattr(asyncio, "eager_task_factory"):  # 3.12+: coro tasks that never await skip a loop tick
+                    self._loop.set_task_factory(asyncio.eager_task_factory)
+                threading.Thread(target=self.run_asyncio, args=(self._loop,), name="minRTOS-asyncio", daemon=True).start()
             self.log(f"✅ Task {task.name} added.")
             self.schedule_cond.notify()
+        if old is not None and old is not task:
+            old.stop()  # Its pending releases are skipped once the name maps to the new task
+        return slot
+
+    def add_tasks(self, tasks):
+        """Add several tasks under one lock acquisition; returns their slot handles in order."""
+        with self.schedule_cond:
+            return [self.add_task(task) for task in tasks]
 
     def remove_task(self, task_name):
-        """Remove a task safely."""
+        """Remove a task safely, by name or by the slot id returned from add_task."""
         with self.schedule_cond:
-            if task_name in self.tasks:
-                task = self.tasks.pop(task_name)
-                task.stop()
-                if task.process.is_alive():
-                    task.process.terminate()
-                    task.process.join(timeout=1)
-                    if task.process.is_alive():
-                        self.log(f"⚠️ Task {task_name} did not terminate, forcing kill.")
-                        task.process.kill()
-                        task.process.join(timeout=1)
-                del self.message_queues[task_name]
-                self.log(f"❌ Task {task_name} removed.")
+            if type(task_name) is int:
+                task = self._slot_task(task_name)
+                task_name = task.name if task is not None else None
+            task = self.tasks.pop(task_name, None)
+            if task is not None:
+                del self.message_queues[task_name]  # Pending heap entries are skipped when popped
+                self._missed_total -= task._missed_seen
+                self._all_periodic = None  # Recomputed lazily by dynamic_policy_switch
+                self._free_slot(task._slot)
+                self._check_done()
+            self.schedule_cond.notify()
+        if task is not None:
+            task.stop()
+            self.log(f"❌ Task {task_name} removed.")
+
+    def _slot_task(self, slot):
+        """Task in a slot, or None for an empty or out-of-range id (like an unknown name)."""
+        return self._task_slots[slot] if 0 <= slot < self.max_tasks else None
+
+    def _free_slot(self, slot):
+        """Return a task slot to the free stack, dropping any undelivered messages."""
+        self._task_slots[slot] = None
+        self._msg_queues[slot].clear()
+        self._free_slots.append(slot)
+
+    @staticmethod
+    def _make_key(policy):
+        """Specialize the sort key for a policy once, instead of branching on every call."""
+        inf = float('inf')
+        if policy == "EDF":
+            def absolute_deadline(task):
+                """Release time plus relative deadline (implicit deadline = period)."""
+                relative = task.deadline or task.period
+                if not relative:
+                    return inf
+                release = time.perf_counter() if task.event_driven else task.next_run
+                return release + relative
+            return absolute_deadline
+        if policy == "RMS":
+            return lambda task: task.period if task.period > 0 else inf
+        return operator.attrgetter("priority")
+
+    def _rebuild_heap(self):
+        """Re-key every live task and re-queue the released ones, e.g. after a policy switch."""
+        self._clear_ready()
+        for task in self.tasks.values():
+            task._sort_key = self._prio_key(task)
+            if task._triggered:
+                self._enqueue(task)
+
+    def _schedule_release(self, task):
+        """Queue the task's next periodic release; event-driven tasks wait for trigger_task."""
+        if not task.event_driven:
+            heapq.heappush(self._releases, (task.next_run, next(self._heap_seq), task))
+
+    def _clear_ready(self):
+        """Empty the ready heap and every priority bucket."""
+        self._ready.clear()
+        for bucket in self._buckets:
+            bucket.clear()
+        self._bitmap = 0
+
+    def _enqueue(self, task):
+        """Queue a released task: O(1) bucket for fixed priorities, heap for EDF/RMS keys."""
+        if self.scheduling_policy == "fixed":
+            task._sort_key = task.priority  # Live value: Mutex ceilings boost and restore it between releases
+            level = min(max(int(task._sort_key), 0), PRIORITY_LEVELS - 1)
+            self._buckets[level].append(task.name)
+            self._bitmap |= 1 << level
+        else:
+            if self.scheduling_policy == "EDF":
+                task._sort_key = self._prio_key(task)  # Absolute deadlines move with every release
+            heapq.heappush(self._ready, (task._sort_key, next(self._heap_seq), task.name))
+
+    def _dequeue(self):
+        """Pop the next released task name, or None: highest bucket, else smallest heap key."""
+        if self.scheduling_policy == "fixed":
+            if not self._bitmap:
+                return None
+            level = self._bitmap.bit_length() - 1
+            bucket = self._buckets[level]
+            name = bucket.popleft()
+            if not bucket:
+                self._bitmap &= ~(1 << level)
+            return name
+        return heapq.heappop(self._ready)[2] if self._ready else None
+
+    def _release(self, task):
+        """Release callback from Task: queue the task as ready and wake the loop."""
+        with self.schedule_cond:
+            if self.tasks.get(task.name) is task:
+                self._enqueue(task)
+                self.schedule_cond.notify()
+
+    def _release_due(self, now):
+        """Release every task whose next_run has passed; returns the next release time."""
+        releases = self._releases
+        while releases and releases[0][0] <= now:
+            task = heapq.heappop(releases)[2]
+            # Entries of removed or replaced tasks are stale: the name may now belong to another Task
+            if self.tasks.get(task.name) is task and task.running:
+                task.release()
+        return releases[0][0] if releases else None
+
+    def _pop_ready(self):
+        """Pop the highest-priority released task, skipping stale, suspended or in-flight entries."""
+        while True:
+            name = self._dequeue()
+            if name is None:
+                return None
+            task = self.tasks.get(name)
+            if (task is not None and task.is_runnable() and not task._suspended
+                    and task.name not in self._in_flight):
+                return task
+
+    def _run_one(self, task):
+        """Run one release of the task and re-arm its next periodic release."""
+        try:
+            task.run()
+        except Exception as e:
+            self.log(f"⚠️ Task {task.name} crashed: {e}")
+            self._crashed.append(task)
+        self._complete(task)
+
+    async def _run_one_async(self, task):
+        """Coroutine counterpart of _run_one for coro tasks."""
+        try:
+            await task.run_async()
+        except Exception as e:
+            self.log(f"⚠️ Task {task.name} crashed: {e}")
+            self._crashed.append(task)
+        self._complete(task)
+
+    def _complete(self, task):
+        """Re-arm the task after a run and wake the scheduler loop."""
+        with self.schedule_cond:
+            self._in_flight.discard(task.name)
+            registered = self.tasks.get(task.name) is task
+            missed = task.metrics["missed_deadlines"]
+            if registered and missed != task._missed_seen:
+                self._missed_total += missed - task._missed_seen
+                task._missed_seen = missed
+            if registered and task.running:
+                self._schedule_release(task)
+                if task._triggered:  # Triggered again while on the pool
+                    self._release(task)
+            elif registered:
+                self._check_done()
             self.schedule_cond.notify()
 
-    def _get_task_priority(self, task):
-        """Determine task priority based on scheduling policy."""
-        if self.scheduling_policy == "EDF":
-            return task.deadline if task.deadline else float('inf')
-        elif self.scheduling_policy == "RMS":
-            return task.period if task.period > 0 else float('inf')
-        return task.priority
+    def _check_done(self):
+        """Set _all_done once every registered task has stopped (caller holds the lock)."""
+        if not self._crashed and not any(task.running for task in self.tasks.values()):
+            self._all_done.set()
+
+    def snapshot_metrics(self):
+        """Copy every task's metrics under one lock acquisition; {task name: metrics dict}."""
+        with self.schedule_cond:
+            return {name: dict(task.metrics, exec_history=list(task.metrics["exec_history"]))
+                    for name, task in self.tasks.items()}
+
+    def join_tasks(self, timeout=None):
+        """Block until every task has stopped (e.g. reached max_runs); returns False on timeout."""
+        return self._all_done.wait(timeout)
 
     def dynamic_policy_switch(self):
         """Dynamically switch scheduling policy based on missed deadlines."""
-        total_missed = sum(int(task.metrics["missed_deadlines"]) for task in self.tasks.values())
+        if self._all_periodic is None:
+            self._all_periodic = all(task.period > 0 for task in self.tasks.values())
 
         new_policy = "fixed"
-        if total_missed > 0:
+        if self._missed_total > 0:
             new_policy = "EDF"
-        elif all(task.period > 0 for task in self.tasks.values()):
+        elif self._all_periodic:
             new_policy = "RMS"
 
         if new_policy != self.scheduling_policy:
             self.log(f"🔄 Switching scheduling policy from {self.scheduling_policy} to {new_policy}")
             self.scheduling_policy = new_policy
+            self._prio_key = self._make_key(new_policy)
+            self._rebuild_heap()
 
     def monitor_tasks(self):
-        """Monitor and restart failed tasks."""
+        """Restart crashed tasks in place: reset their run state and release them again."""
+        if not self._crashed:
+            return  # Common case: no lock taken, no list allocated
         with self.lock:
-            for task in list(self.tasks.values()):
-                if not task.process.is_alive() and task.running.value:
+            crashed, self._crashed = self._crashed, []
+            for task in crashed:
+                if self.tasks.get(task.name) is task and task.running:
                     self.log(f"⚠️ Task {task.name} crashed. Restarting...")
-                    new_task = Task(
-                        task.name, task.update, period=task.period, priority=task.priority,
-                        deadline=task.deadline, overrun_action=task.overrun_action, event_driven=(task.event is not None),
-                        max_runs=task.max_runs
-                    )
-                    self.tasks[task.name] = new_task
-                    self.message_queues[task.name] = multiprocessing.Queue()
-                    new_task.process.start()
+                    # Same run state as a newly added task; metrics and run_count are kept
+                    task._suspended = False
+                    task._waiting_on = None
+                    self._msg_queues[task._slot].clear()
+                    task.next_run = time.perf_counter()
+                    self._schedule_release(task)  # Duplicate releases are skipped once it has run
+
+    def _apply_os_scheduling(self):
+        """Give the calling thread real-time OS priority and CPU affinity, if configured."""
+        try:
+            if self.rt_priority is not None and hasattr(os, "sched_setscheduler"):
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self.rt_priority))
+            if self.cpu is not None and hasattr(os, "sched_setaffinity"):
+                os.sched_setaffinity(0, {self.cpu})
+        except OSError as e:  # PermissionError without CAP_SYS_NICE, or a bad core
+            self.log(f"⚠️ Could not apply real-time scheduling: {e}")
+
+    @staticmethod
+    def _spin_until(deadline):
+        """Busy-wait until deadline for waits shorter than the OS sleep granularity."""
+        clock = time.perf_counter
+        while clock() < deadline:
+            pass
 
     def run_scheduler(self):
-        """Continuously manage tasks based on scheduling policy."""
+        """Pop due tasks and run them inline, or on the pool if parallel; sleep until the next release."""
+        self._apply_os_scheduling()
+        loop_threads.add(threading.get_ident())  # Lets Mutex refuse to block this thread on an inline owner
         while self.scheduler_running.is_set():
             with self.schedule_cond:
-                self.schedule_cond.wait(timeout=1)
                 self.dynamic_policy_switch()
-
-                if not self.tasks:
-                    time.sleep(1)  # Avoid excessive CPU usage when idle
-                    continue
-
-                # Sort tasks based on policy
-                task_queue = sorted(self.tasks.values(), key=self._get_task_priority)
-                highest_priority_task = task_queue[0]
-
-                # Ensure only the highest-priority task runs
-                for task in self.tasks.values():
-                    if task is not highest_priority_task and task.running.value:
-                        task.stop()
-
                 self.monitor_tasks()
-                time.sleep(0.01)  # Small delay to prevent excessive CPU load
+                next_release = self._release_due(time.perf_counter())
+                task = self._pop_ready()
+                if task is None:
+                    # Releases, triggers, completions and add/remove notify us earlier
+                    if next_release is None:
+                        self.schedule_cond.wait(timeout=1)
+                        continue
+                    remaining = next_release - time.perf_counter()
+                    if remaining > self.busy_wait_threshold:
+                        # Sleep most of the way; the sub-threshold tail is spun below
+                        self.schedule_cond.wait(timeout=min(1, remaining - self.busy_wait_threshold / 2))
+                        continue
+                else:
+                    task._triggered = False
+                    if task.coro:
+                        self._in_flight.add(task.name)
+                        asyncio.run_coroutine_threadsafe(self._run_one_async(task), self._loop)
+                        continue
+                    if task.parallel:
+                        self._in_flight.add(task.name)
+                        self._executor.submit(self._run_one, task)
+                        continue
+            if task is None:
+                self._spin_until(next_release)  # Outside the lock; sleeping would overshoot
+                continue
+            self._run_one(task)  # Outside the lock so triggers and add/remove never wait on update()
 
+        loop_threads.discard(threading.get_ident())
         self.log("🔴 Scheduler loop exited.")
 
+    def run_asyncio(self, loop):
+        """Run the asyncio loop that awaits coro tasks; one OS thread for all of them."""
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()  # Our own reference: stop_all clears self._loop before we get here
+
     def start(self):
         """Start the scheduler."""
+        if not self._log_thread.is_alive():  # join() retired the previous writer
+            self._log_thread = threading.Thread(target=self._log_writer, daemon=True)
+            self._log_thread.start()
         self.scheduler_running.set()
         self.log(f"🟢 minRTOS running with {self.scheduling_policy} scheduling.")
         self.scheduler_thread = threading.Thread(target=self.run_scheduler, daemon=True)
@@ -124,17 +382,24 @@ class Scheduler:
         """Stop all tasks and exit the scheduler."""
         self.scheduler_running.clear()
         with self.schedule_cond:
-            for task in list(self.tasks.values()):
+            for task in self.tasks.values():
                 task.stop()
-                if task.process.is_alive():
-                    task.process.terminate()
-                    task.process.join(timeout=1)
-                    if task.process.is_alive():
-                        self.log(f"⚠️ Task {task.name} did not terminate, forcing kill.")
-                        task.process.kill()
-                        task.process.join(timeout=1)
+                self._free_slot(task._slot)
             self.tasks.clear()
+            self.message_queues.clear()
+            self._clear_ready()
+            self._missed_total = 0
+            self._all_periodic = True
+            self._releases.clear()
+            self._crashed.clear()
+            self._all_done.set()
             self.schedule_cond.notify()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None  # A restarted scheduler creates a fresh pool on demand
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
         self.log("🛑 All tasks stopped.")
 
     def join(self):
@@ -142,35 +407,60 @@ class Scheduler:
         if self.scheduler_thread and self.scheduler_thread.is_alive():
             self.scheduler_thread.join()
         self.log("✅ Scheduler successfully shut down.")
+        self.log_queue.put_nowait(None)  # Sentinel: let _log_writer close the file
+        self._log_thread.join(timeout=1)
 
     def trigger_task(self, task_name):
-        """Trigger an event-driven task."""
-        if task_name in self.tasks:
-            task = self.tasks[task_name]
-            if task.event:
-                task.event.set()
+        """Trigger an event-driven task, by name or slot id."""
+        task = self._slot_task(task_name) if type(task_name) is int else self.tasks.get(task_name)
+        if task is not None:
+            task.trigger()
+
+    def _mailbox(self, task_name):
+        """Mailbox for a task name or slot id; ids index the pre-sized table without hashing."""
+        if type(task_name) is int:
+            return self._msg_queues[task_name] if self._slot_task(task_name) is not None else None
+        return self.message_queues.get(task_name)
 
     def send_message(self, to_task, message):
         """Send a message to another task."""
-        if to_task in self.message_queues:
-            self.message_queues[to_task].put(message)
+        mailbox = self._mailbox(to_task)
+        if mailbox is not None:
+            mailbox.append(message)
 
     def receive_message(self, task_name):
         """Receive a message from a task queue."""
-        if task_name in self.message_queues:
-            try:
-                return self.message_queues[task_name].get_nowait()
-            except queue.Empty:
-                return None
+        mailbox = self._mailbox(task_name)
+        if mailbox:
+            return mailbox.popleft()
+        return None
+
+    def trace(self, event, *args):
+        """Record a hot-path event in the process-wide trace ring; formatting is deferred to dump_trace()."""
+        minTrace.trace(event, *args)
+
+    def dump_trace(self):
+        """Return the formatted process-wide trace ring, oldest first; includes other Schedulers' events."""
+        return minTrace.dump_trace()
 
     def log(self, message):
         """Log messages to a file and console."""
         timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
         log_message = f"[{timestamp}] {message}"
         print(log_message)
+        self.log_queue.put_nowait(log_message)
+
+    def _log_writer(self):
+        """Append queued log messages to LOG_FILE, flushing whenever the queue drains."""
         try:
             with open(LOG_FILE, "a") as log_file:
-                log_file.write(log_message + "\n")
+                while True:
+                    message = self.log_queue.get()
+                    if message is None:
+                        break
+                    log_file.write(message + "\n")
+                    if self.log_queue.empty():
+                        log_file.flush()
         except Exception as e:
             print(f"[LOG ERROR] {e}")
 
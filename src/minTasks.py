@@ -1,14 +1,10 @@
-import multiprocessing
 import time
 import sys
 
-# Shared Manager for all tasks
-_shared_manager = multiprocessing.Manager()
-
 class Task:
     """Real-time task class for minRTOS"""
     def __init__(self, name, update_func, period=0, priority=1, deadline=None,
-                 overrun_action="kill", event_driven=False, max_runs=None):
+                 overrun_action="kill", event_driven=False, max_runs=None, parallel=False, coro=False):
         """
         Args:
             name (str): Task name
@@ -19,97 +15,162 @@ class Task:
             overrun_action (str): Action on deadline overrun ('kill' or 'pause')
             event_driven (bool): If True, task is event-driven
             max_runs (int): Maximum number of runs
+            parallel (bool): If True, update_func runs on a worker thread instead of the scheduler loop
+            coro (bool): If True, update_func is an async def awaited on the scheduler's asyncio loop
         """
         self.name = name
         self.update = update_func
         self.period = period
         self.priority = priority
         self.original_priority = priority
+        self._saved_prio_stack = []  # (mutex, priority before locking it), innermost last
+        self._waiting_on = None  # Mutex this task is blocked on, for deadlock detection
         self.deadline = deadline
         self.overrun_action = overrun_action
         self.next_run = time.perf_counter()
-        self.running = multiprocessing.Value('b', True)
-        self.event = multiprocessing.Event() if event_driven else None
-        self.metrics = _shared_manager.dict({
+        self.running = True
+        self._suspended = False  # Skipped by the scheduler until resume()
+        self.event_driven = event_driven
+        self.parallel = parallel  # Run update() on the scheduler's thread pool instead of inline
+        self.coro = coro  # update() is a coroutine function run on the scheduler's asyncio loop
+        self._triggered = False  # Pending release (scheduler timer or external trigger)
+        self.on_release = None  # Called with the task when it becomes ready; set by the scheduler
+        self.metrics = {
             "exec_time": 0,
             "exec_history": [],
             "missed_deadlines": 0,
+            "errors": 0,  # update() exceptions; kept apart from deadline overruns
             "cpu_usage": 0,
             "memory_usage": 0
-        })
-        self.process = multiprocessing.Process(target=self.run)
+        }
         self.max_runs = max_runs  # Maximum number of times the task runs
+        self.run_count = 0
+        self.metrics["memory_usage"] = sys.getsizeof(self)  # Object header size; constant, so measured once
+
+        # Specialize the run step on flags fixed at construction
+        if not deadline:
+            self._check_deadline = None
+        elif overrun_action == "kill":
+            self._check_deadline = self._kill_on_overrun
+        elif overrun_action == "pause":
+            self._check_deadline = self._pause_on_overrun
+        else:
+            self._check_deadline = self._count_overrun
+
+    def is_runnable(self):
+        """True if the task has been released and would execute right now if not suspended."""
+        return self.running and self._triggered
+
+    def suspend(self):
+        """Hold the task back from the scheduler until resume() is called."""
+        self._suspended = True
+
+    def resume(self):
+        """Let a suspended task run again, handing back any release it missed."""
+        if self._suspended:
+            self._suspended = False
+            if self._triggered and self.on_release:
+                self.on_release(self)
+
+    def release(self):
+        """Mark the task ready for its next run; called by the scheduler when next_run is due."""
+        self._triggered = True
+        if self.on_release:
+            self.on_release(self)
+
+    def trigger(self):
+        """Wake an event-driven task."""
+        if self.event_driven:
+            self.release()
+
+    def _count_overrun(self, execution_time):
+        """Record a missed deadline and keep running."""
+        if execution_time > self.deadline:
+            self.metrics["missed_deadlines"] += 1
+        return True
+
+    def _kill_on_overrun(self, execution_time):
+        """Stop the task on a missed deadline; returns False if it was stopped."""
+        if execution_time <= self.deadline:
+            return True
+        self.metrics["missed_deadlines"] += 1
+        print(f"💀 Task {self.name} exceeded deadline and is being killed.")
+        self.running = False
+        return False
+
+    def _pause_on_overrun(self, execution_time):
+        """Pause an event-driven task on a missed deadline; returns False if it was stopped."""
+        if execution_time <= self.deadline:
+            return True
+        self.metrics["missed_deadlines"] += 1
+        print(f"⏸️ Task {self.name} exceeded deadline and is paused.")
+        if self.event_driven:
+            return True  # Stays parked until the next trigger
+        print(f"⚠️ Task {self.name} cannot pause (not event-driven). Stopping task.")
+        self.running = False
+        return False
+
+    def _reached_max_runs(self):
+        """Stop the task once it has run max_runs times."""
+        if self.max_runs is not None and self.run_count >= self.max_runs:
+            self.running = False
+            print(f"Task {self.name} has reached maximum run limit and is exiting.")
+            return True
+        return False
 
     def run(self):
-        """Task execution loop with fault tolerance and resource management."""
-        run_count = 0
-
-        while self.running.value:
-            if self.max_runs is not None and run_count >= self.max_runs:
-                self.running.value = False
-                print(f"Task {self.name} has reached maximum run limit and is exiting.")
-                break
-
-            now = time.perf_counter()
-
-            if self.event:
-                self.event.wait()  # Block until triggered
-                self.event.clear()
-
-            if now >= self.next_run:
-                try:
-                    start_time = time.perf_counter()
-                    self.update()
-                    end_time = time.perf_counter()
-                except Exception as e:
-                    self.metrics["missed_deadlines"] += 1
-                    print(f"❌ Task {self.name} encountered error: {e}")
-                    self.running.value = False
-                    time.sleep(0.05)  # Prevent immediate restart
-                    continue
-
-                execution_time = end_time - start_time
-                self.metrics["exec_time"] = execution_time
-                self.metrics["exec_history"].append(execution_time)
-
-                if self.period > 0:
-                    self.metrics["cpu_usage"] = (execution_time / self.period) * 100
-                else:
-                    self.metrics["cpu_usage"] = execution_time * 100
-
-                self.metrics["memory_usage"] = sys.getsizeof(self)
-
-                if self.deadline and execution_time > self.deadline:
-                    self.metrics["missed_deadlines"] += 1
-                    if self.overrun_action == "kill":
-                        print(f"💀 Task {self.name} exceeded deadline and is being killed.")
-                        self.running.value = False
-                        time.sleep(0.05)  # Avoid immediate restart
-                        continue
-                    elif self.overrun_action == "pause":
-                        print(f"⏸️ Task {self.name} exceeded deadline and is paused.")
-                        if self.event:
-                            self.event.wait()  # Wait until resumed
-                        else:
-                            print(f"⚠️ Task {self.name} cannot pause (not event-driven). Stopping task.")
-                            self.running.value = False
-                            time.sleep(0.05)
-                            continue
-
-                self.next_run = now + self.period if self.period > 0 else now
-                run_count += 1  # Increment run counter
-
-            time.sleep(0.02)  # Reduce CPU usage (less busy-wait)
+        """Run one release of the task with fault tolerance; called by the scheduler."""
+        if self._reached_max_runs():
+            return
+
+        start_time = time.perf_counter()  # Doubles as the release timestamp
+        try:
+            self.update()
+            end_time = time.perf_counter()
+        except Exception as e:
+            self._fail(e)
+            return
+        self._finish_run(start_time, end_time)
+
+    async def run_async(self):
+        """Coroutine counterpart of run() for coro tasks; awaits update()."""
+        if self._reached_max_runs():
+            return
+
+        start_time = time.perf_counter()
+        try:
+            await self.update()
+            end_time = time.perf_counter()
+        except Exception as e:
+            self._fail(e)
+            return
+        self._finish_run(start_time, end_time)
+
+    def _fail(self, error):
+        """Stop the task after update() raised."""
+        self.metrics["errors"] += 1
+        print(f"❌ Task {self.name} encountered error: {error}")
+        self.running = False
+
+    def _finish_run(self, start_time, end_time):
+        """Record metrics, apply the overrun action and advance next_run."""
+        execution_time = end_time - start_time
+        self.metrics["exec_time"] = execution_time
+        self.metrics["exec_history"].append(execution_time)
+
+        if self.period > 0:
+            self.metrics["cpu_usage"] = (execution_time / self.period) * 100
+        else:
+            self.metrics["cpu_usage"] = execution_time * 100
+
+        if self._check_deadline is not None and not self._check_deadline(execution_time):
+            return
+
+        self.next_run = start_time + self.period if self.period > 0 else start_time
+        self.run_count += 1  # Increment run counter
+        self._reached_max_runs()
 
     def stop(self):
         """Stop task execution safely"""
-        self.running.value = False
-        if self.event:
-            self.event.set()
-        if self.process.is_alive():
-            self.process.terminate()
-            self.process.join(timeout=1)
-            if self.process.is_alive():
-                self.process.kill()
-                self.process.join(timeout=1)
+        self.running = False  # The scheduler drops the task at its next release
         print(f"🛑 Task {self.name} has been stopped.")
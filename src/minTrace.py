@@ -0,0 +1,29 @@
+import time
+from collections import deque
+
+# Fixed-size ring of (perf_counter_ns, event, args); the oldest records fall off.
+# One ring per process: every Scheduler and every Mutex records into it.
+ring = deque(maxlen=4096)
+
+# Formatters applied only when the trace is dumped
+TRACE_FORMATS = {
+    "mutex_acquire": "✅ {0} acquired Mutex",
+    "mutex_handoff": "✅ {0} acquired Mutex from queue",
+    "mutex_timeout": "⏳ {0} timed out waiting for Mutex",
+    "mutex_boost": "⚡ Boosting priority of {0} from {1} to {2}",
+    "mutex_deadlock": "💥 {0} would deadlock on Mutex held by {1}",
+    "mutex_restore": "🔓 {0} released Mutex (Restoring priority {1} -> {2})",
+}
+
+def trace(event, *args):
+    """Record an event without formatting it; deque.append is atomic, so no lock is taken."""
+    ring.append((time.perf_counter_ns(), event, args))
+
+def dump_trace():
+    """Format the recorded events of the whole process, oldest first."""
+    lines = []
+    for timestamp, event, args in list(ring):
+        fmt = TRACE_FORMATS.get(event)
+        message = fmt.format(*args) if fmt else f"{event} {args}"
+        lines.append(f"[{timestamp}] {message}")
+    return lines
@@ -3,6 +3,12 @@ import hashlib
 import random
 from minRTOS import Scheduler, Task, Mutex
 
+def _busy(dt):
+    # Spin instead of sleeping so overruns come from real work, not OS sleep jitter
+    end = time.monotonic() + dt
+    while time.monotonic() < end:
+        pass
+
 class Block:
     def __init__(self, index, prev_hash, transactions):
         self.index = index
@@ -17,12 +23,23 @@ class Block:
         return hashlib.sha256(block_string.encode()).hexdigest()
 
     def mine(self, difficulty):
-        prefix = '0' * difficulty
+        # Only the nonce changes while mining, so hash the fixed prefix once and copy its midstate
+        midstate = hashlib.sha256(f"{self.index}{self.prev_hash}{self.transactions}".encode())
+        zero_bytes, odd_nibble = divmod(difficulty, 2)
+        zero_prefix = b'\0' * zero_bytes
+        suffix = str(self.timestamp).encode()
+        nonce = self.nonce
         while True:
-            self.hash = self.compute_hash()
-            if self.hash.startswith(prefix):
+            h = midstate.copy()
+            h.update(str(nonce).encode())
+            h.update(suffix)
+            digest = h.digest()
+            # Compare raw bytes instead of hexdigest().startswith('0' * difficulty)
+            if digest.startswith(zero_prefix) and (not odd_nibble or digest[zero_bytes] < 0x10):
                 break
-            self.nonce += 1
+            nonce += 1
+        self.nonce = nonce
+        self.hash = digest.hex()
 
 class BlockchainStateManager:
     def __init__(self):
@@ -60,12 +77,14 @@ def tx_validation_task(state_manager):
     if not state_manager.tx_pool:
         print("[Validation] No transactions to validate.")
         return
-    for tx in list(state_manager.tx_pool):
+    valid = []
+    for tx in state_manager.tx_pool:
         if tx['amount'] <= 0:
             print(f"[Validation] Invalid transaction: {tx}")
-            state_manager.tx_pool.remove(tx)
         else:
             print(f"[Validation] Transaction valid: {tx}")
+            valid.append(tx)
+    state_manager.tx_pool[:] = valid  # One O(N) rebuild instead of a list.remove per invalid tx
 
 # Contract execution sandbox
 def contract_sandbox_task(contract_name, state_manager):
@@ -73,7 +92,7 @@ def contract_sandbox_task(contract_name, state_manager):
     # Simulate contract logic
     tx = {'to': contract_name, 'amount': random.randint(1, 10)}
     state_manager.apply_transaction(tx)
-    time.sleep(0.05)
+    _busy(0.05)
 
 # Network simulation
 def network_task(state_manager):
@@ -81,42 +100,44 @@ def network_task(state_manager):
     # Simulate receiving a transaction
     tx = {'to': f'user{random.randint(1,5)}', 'amount': random.randint(1, 20)}
     state_manager.add_transaction(tx)
-    time.sleep(0.03)
+    _busy(0.03)
 
 # API simulation
 def api_task(state_manager):
     print("[API] Querying blockchain state...")
     print(f"[API] Current state: {state_manager.state}")
-    time.sleep(0.02)
+    _busy(0.02)
 
 def main():
     print("--- minRTOS Blockchain Test Start ---")
     scheduler = Scheduler()
+    tasks = []
     state_manager = BlockchainStateManager()
     difficulty = 3
 
     # Add network task
-    net_task = Task("NetworkTask", lambda: network_task(state_manager), period=0.1, priority=5, max_runs=10)
-    scheduler.add_task(net_task)
+    net_task = Task("NetworkTask", lambda s=state_manager: network_task(s), period=0.1, priority=5, max_runs=10)
+    tasks.append(net_task)
 
     # Add transaction validation task
-    validation_task = Task("TxValidationTask", lambda: tx_validation_task(state_manager), period=0.12, priority=6, max_runs=8)
-    scheduler.add_task(validation_task)
+    validation_task = Task("TxValidationTask", lambda s=state_manager: tx_validation_task(s), period=0.12, priority=6, max_runs=8)
+    tasks.append(validation_task)
 
     # Add consensus (mining) task
-    consensus = Task("ConsensusTask", lambda: consensus_task(state_manager, difficulty), period=0.15, priority=7, max_runs=5)
-    scheduler.add_task(consensus)
+    consensus = Task("ConsensusTask", lambda s=state_manager, d=difficulty: consensus_task(s, d), period=0.15, priority=7, max_runs=5)
+    tasks.append(consensus)
 
     # Add contract sandbox task
-    contract = Task("ContractSandboxTask", lambda: contract_sandbox_task("DemoContract", state_manager), period=0.13, priority=8, max_runs=6)
-    scheduler.add_task(contract)
+    contract = Task("ContractSandboxTask", lambda s=state_manager: contract_sandbox_task("DemoContract", s), period=0.13, priority=8, max_runs=6)
+    tasks.append(contract)
 
     # Add API task
-    api = Task("APITask", lambda: api_task(state_manager), period=0.2, priority=4, max_runs=7)
-    scheduler.add_task(api)
+    api = Task("APITask", lambda s=state_manager: api_task(s), period=0.2, priority=4, max_runs=7)
+    tasks.append(api)
 
+    scheduler.add_tasks(tasks)
     scheduler.start()
-    time.sleep(3.5)
+    scheduler.join_tasks(timeout=3.5)  # Returns as soon as every task reaches max_runs
     scheduler.stop_all()
     scheduler.join()
     print("--- minRTOS Blockchain Test End ---")
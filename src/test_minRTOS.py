@@ -1,132 +1,160 @@
+import logging
+import os
+import sys
 import time
+from collections import deque
 from minRTOS import Scheduler, Task, Mutex
 from minBlockchain import BlockchainStateManager, Block, consensus_task, tx_validation_task, contract_sandbox_task, network_task, api_task
 
+log = logging.getLogger("minRTOS.test")  # Task-body output
+# Covers this demo and minBlockchain; MINRTOS_LOG=WARNING silences both
+logging.getLogger("minRTOS").setLevel(os.environ.get("MINRTOS_LOG", "DEBUG"))
+
+def _busy(dt):
+    # Spin instead of sleeping so overruns come from real work, not OS sleep jitter
+    end = time.monotonic() + dt
+    while time.monotonic() < end:
+        pass
+
 def simple_update():
-    print("Task is running.")
-    time.sleep(0.05)
+    log.debug("Task is running.")
+    _busy(0.05)
 
 def deadline_update():
-    print("Deadline task running.")
-    time.sleep(0.2)  # Intentionally longer than deadline
+    log.debug("Deadline task running.")
+    _busy(0.2)  # Intentionally longer than deadline
+
+_DUMMY_TASKS = {}  # One stand-in Task per caller, reused across acquisitions
+
+def _noop():
+    pass
 
 def mutex_update(mutex, name):
-    print(f"{name} attempting to acquire mutex...")
-    acquired = mutex.acquire(task=Task(name, lambda: None))
+    log.debug("%s attempting to acquire mutex...", name)
+    task = _DUMMY_TASKS.get(name)
+    if task is None:
+        task = _DUMMY_TASKS[name] = Task(name, _noop)
+    acquired = mutex.acquire(task=task)
     if acquired:
-        print(f"{name} acquired mutex!")
-        time.sleep(0.1)
+        log.debug("%s acquired mutex!", name)
+        _busy(0.1)
         mutex.release()
-        print(f"{name} released mutex!")
+        log.debug("%s released mutex!", name)
     else:
-        print(f"{name} failed to acquire mutex!")
+        log.debug("%s failed to acquire mutex!", name)
 
 def blockchain_contract_update(contract_name, state):
-    print(f"[Blockchain] Executing contract: {contract_name}, current state: {state['value']}")
+    log.debug("[Blockchain] Executing contract: %s, current state: %s", contract_name, state['value'])
     # Simulate contract logic: increment state, check for overflow
     state['value'] += 1
     if state['value'] > 5:
-        print(f"[Blockchain] {contract_name} state overflow!")
+        log.debug("[Blockchain] %s state overflow!", contract_name)
         raise Exception("State overflow")
-    time.sleep(0.07)
+    _busy(0.07)
 
 def blockchain_event_update(contract_name, event_queue):
     if not event_queue:
-        print(f"[Blockchain] {contract_name} waiting for event...")
+        log.debug("[Blockchain] %s waiting for event...", contract_name)
         return
-    event = event_queue.pop(0)
-    print(f"[Blockchain] {contract_name} processing event: {event}")
-    time.sleep(0.05)
+    event = event_queue.popleft()
+    log.debug("[Blockchain] %s processing event: %s", contract_name, event)
+    _busy(0.05)
 
 def main():
+    logging.basicConfig(format="%(message)s", stream=sys.stdout)
     print("--- minRTOS Blockchain Integration Test Start ---")
     scheduler = Scheduler()
+    tasks = []
     state_manager = BlockchainStateManager()
     difficulty = 3
 
     # Add network task
-    net_task = Task("NetworkTask", lambda: network_task(state_manager), period=0.1, priority=5, max_runs=10)
-    scheduler.add_task(net_task)
+    net_task = Task("NetworkTask", lambda s=state_manager: network_task(s), period=0.1, priority=5, max_runs=10)
+    tasks.append(net_task)
 
     # Add transaction validation task
-    validation_task = Task("TxValidationTask", lambda: tx_validation_task(state_manager), period=0.12, priority=6, max_runs=8)
-    scheduler.add_task(validation_task)
+    validation_task = Task("TxValidationTask", lambda s=state_manager: tx_validation_task(s), period=0.12, priority=6, max_runs=8)
+    tasks.append(validation_task)
 
     # Add consensus (mining) task
-    consensus = Task("ConsensusTask", lambda: consensus_task(state_manager, difficulty), period=0.15, priority=7, max_runs=5)
-    scheduler.add_task(consensus)
+    consensus = Task("ConsensusTask", lambda s=state_manager, d=difficulty: consensus_task(s, d), period=0.15, priority=7, max_runs=5)
+    tasks.append(consensus)
 
     # Add contract sandbox task
-    contract = Task("ContractSandboxTask", lambda: contract_sandbox_task("DemoContract", state_manager), period=0.13, priority=8, max_runs=6)
-    scheduler.add_task(contract)
+    contract = Task("ContractSandboxTask", lambda s=state_manager: contract_sandbox_task("DemoContract", s), period=0.13, priority=8, max_runs=6)
+    tasks.append(contract)
 
     # Add API task
-    api = Task("APITask", lambda: api_task(state_manager), period=0.2, priority=4, max_runs=7)
-    scheduler.add_task(api)
+    api = Task("APITask", lambda s=state_manager: api_task(s), period=0.2, priority=4, max_runs=7)
+    tasks.append(api)
 
     # Retain original tests for comparison
     # Test: Add a simple periodic task
     task1 = Task("SimpleTask", simple_update, period=0.1, priority=2, max_runs=3)
-    scheduler.add_task(task1)
+    tasks.append(task1)
 
     # Test: Add a deadline task (should be killed after deadline overrun)
     task2 = Task("DeadlineTask", deadline_update, period=0.1, priority=1, deadline=0.1, overrun_action="kill", max_runs=2)
-    scheduler.add_task(task2)
+    tasks.append(task2)
 
     # Test: Mutex with two tasks
     mutex = Mutex()
-    def mutex_task1():
+    def mutex_task1(mutex=mutex):
         mutex_update(mutex, "MutexTask1")
-    def mutex_task2():
+    def mutex_task2(mutex=mutex):
         mutex_update(mutex, "MutexTask2")
     mtask1 = Task("MutexTask1", mutex_task1, period=0.15, priority=3, max_runs=2)
     mtask2 = Task("MutexTask2", mutex_task2, period=0.15, priority=4, max_runs=2)
-    scheduler.add_task(mtask1)
-    scheduler.add_task(mtask2)
+    tasks.append(mtask1)
+    tasks.append(mtask2)
 
     # Blockchain contract simulation: stateful contract
     contract_state = {'value': 0}
-    def contract_task():
+    def contract_task(contract_state=contract_state):
         blockchain_contract_update("DemoContract", contract_state)
     contract2 = Task("DemoContractTask", contract_task, period=0.12, priority=5, max_runs=7)
-    scheduler.add_task(contract2)
+    tasks.append(contract2)
 
     # Blockchain event-driven contract
-    event_queue = ["Deposit", "Withdraw", "Transfer"]
-    def event_contract_task():
+    event_queue = deque(["Deposit", "Withdraw", "Transfer"])
+    def event_contract_task(event_queue=event_queue):
         blockchain_event_update("EventContract", event_queue)
     event_contract = Task("EventContractTask", event_contract_task, period=0.09, priority=6, max_runs=5)
-    scheduler.add_task(event_contract)
+    tasks.append(event_contract)
 
     # Edge case: contract with zero period (should run once)
     def zero_period_contract():
-        print("[Blockchain] Zero period contract executed.")
+        log.debug("[Blockchain] Zero period contract executed.")
     zero_contract = Task("ZeroPeriodContract", zero_period_contract, period=0, priority=7, max_runs=1)
-    scheduler.add_task(zero_contract)
+    tasks.append(zero_contract)
 
     # Edge case: contract with missed deadline and pause
     def slow_contract():
-        print("[Blockchain] Slow contract running.")
-        time.sleep(0.2)
+        log.debug("[Blockchain] Slow contract running.")
+        _busy(0.2)
     slow_contract_task = Task("SlowContractTask", slow_contract, period=0.1, priority=8, deadline=0.1, overrun_action="pause", max_runs=2)
-    scheduler.add_task(slow_contract_task)
+    tasks.append(slow_contract_task)
 
+    scheduler.add_tasks(tasks)
     scheduler.start()
-    time.sleep(4)  # Let tasks run
+    scheduler.join_tasks(timeout=4)  # Returns as soon as every task reaches max_runs
+    metrics = scheduler.snapshot_metrics()  # Before stop_all, which unregisters every task
     scheduler.stop_all()
     scheduler.join()
     print("--- minRTOS Blockchain Integration Test End ---")
 
     # Print metrics for all tasks
-    print("\nTask Metrics:")
-    for tname, task in scheduler.tasks.items():
-        print(f"Task: {tname}")
-        for k, v in task.metrics.items():
-            print(f"  {k}: {v}")
+    # Build the whole report first and write it once instead of one print per line
+    parts = ["\nTask Metrics:\n"]
+    for tname, task_metrics in metrics.items():
+        parts.append(f"Task: {tname}\n")
+        for k, v in task_metrics.items():
+            parts.append(f"  {k}: {v}\n")
         if tname == "DemoContractTask":
-            print(f"  Final contract state: {contract_state['value']}")
+            parts.append(f"  Final contract state: {contract_state['value']}\n")
         if tname == "EventContractTask":
-            print(f"  Remaining events: {event_queue}")
+            parts.append(f"  Remaining events: {list(event_queue)}\n")
+    sys.stdout.write("".join(parts))
 
     print("\nBlockchain State:")
     print(f"Blocks: {len(state_manager.blocks)}")
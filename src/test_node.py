@@ -1,4 +1,6 @@
-import time
+import logging
+import os
+import sys
 from minRTOS import Scheduler, Task
 from minBlockchain import (
     BlockchainStateManager,
@@ -10,33 +12,37 @@ from minBlockchain import (
 )
 
 def main():
+    logging.basicConfig(format="%(message)s", stream=sys.stdout)
+    logging.getLogger("minRTOS").setLevel(os.environ.get("MINRTOS_LOG", "DEBUG"))  # WARNING silences the node's tasks
     print("--- minRTOS Blockchain Node Simulation ---")
     scheduler = Scheduler()
+    tasks = []
     state_manager = BlockchainStateManager()
     difficulty = 3
 
     # Network: receive transactions
-    net_task = Task("NetworkTask", lambda: network_task(state_manager), period=0.1, priority=5, max_runs=10)
-    scheduler.add_task(net_task)
+    net_task = Task("NetworkTask", lambda s=state_manager: network_task(s), period=0.1, priority=5, max_runs=10)
+    tasks.append(net_task)
 
     # Validation: validate transactions
-    validation_task = Task("TxValidationTask", lambda: tx_validation_task(state_manager), period=0.12, priority=6, max_runs=8)
-    scheduler.add_task(validation_task)
+    validation_task = Task("TxValidationTask", lambda s=state_manager: tx_validation_task(s), period=0.12, priority=6, max_runs=8)
+    tasks.append(validation_task)
 
     # Consensus: mine blocks
-    consensus = Task("ConsensusTask", lambda: consensus_task(state_manager, difficulty), period=0.15, priority=7, max_runs=5)
-    scheduler.add_task(consensus)
+    consensus = Task("ConsensusTask", lambda s=state_manager, d=difficulty: consensus_task(s, d), period=0.15, priority=7, max_runs=5)
+    tasks.append(consensus)
 
     # Contract: execute contract logic
-    contract = Task("ContractSandboxTask", lambda: contract_sandbox_task("DemoContract", state_manager), period=0.13, priority=8, max_runs=6)
-    scheduler.add_task(contract)
+    contract = Task("ContractSandboxTask", lambda s=state_manager: contract_sandbox_task("DemoContract", s), period=0.13, priority=8, max_runs=6)
+    tasks.append(contract)
 
     # API: query blockchain state
-    api = Task("APITask", lambda: api_task(state_manager), period=0.2, priority=4, max_runs=7)
-    scheduler.add_task(api)
+    api = Task("APITask", lambda s=state_manager: api_task(s), period=0.2, priority=4, max_runs=7)
+    tasks.append(api)
 
+    scheduler.add_tasks(tasks)
     scheduler.start()
-    time.sleep(4)
+    scheduler.join_tasks(timeout=4)  # Returns as soon as every task reaches max_runs
     scheduler.stop_all()
     scheduler.join()
     print("--- Node Simulation End ---")